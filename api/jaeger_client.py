@@ -14,28 +14,50 @@ so downstream consumers (like root_cause_analyzer) get a "process" dict
 with "serviceName" directly on each span.
 """
 
+import asyncio
 import os
 import time
-import requests
-from typing import List, Dict, Any
+import httpx
+import orjson
+from cachetools import TTLCache
+from typing import List, Dict, Any, Optional
 
 
 JAEGER_URL = os.getenv("JAEGER_URL", "http://jaeger:16686")
 
+# Burst dashboard refreshes ask for the same (service, window) repeatedly;
+# the query end time is rounded up to this bucket so they share one fetch.
+TRACE_CACHE_TTL_SECONDS = 15
+_trace_cache: TTLCache = TTLCache(maxsize=64, ttl=TRACE_CACHE_TTL_SECONDS)
 
-def fetch_traces(service_name: str, minutes_ago: int = 5) -> List[Dict[str, Any]]:
+
+def invalidate_trace_cache() -> None:
+    """Drop all cached trace fetches (e.g. after a new fault injection)."""
+    _trace_cache.clear()
+
+
+async def fetch_traces(
+    client: httpx.AsyncClient, service_name: str, minutes_ago: int = 5
+) -> List[Dict[str, Any]]:
     """
     Fetch traces from Jaeger for a specific service within a time window.
 
     Args:
+        client: Shared AsyncClient (keep-alive pool owned by the caller)
         service_name: Name of the service to fetch traces for
         minutes_ago: How many minutes back to fetch traces (default: 5)
 
     Returns:
         List of trace objects from Jaeger
     """
+    bucket = int(time.time()) // TRACE_CACHE_TTL_SECONDS
+    key = (service_name, minutes_ago, bucket)
+    cached = _trace_cache.get(key)
+    if cached is not None:
+        return cached
+
     try:
-        end_time = int(time.time() * 1_000_000)
+        end_time = (bucket + 1) * TRACE_CACHE_TTL_SECONDS * 1_000_000
         start_time = end_time - (minutes_ago * 60 * 1_000_000)
 
         url = f"{JAEGER_URL}/api/traces"
@@ -46,13 +68,15 @@ def fetch_traces(service_name: str, minutes_ago: int = 5) -> List[Dict[str, Any]
             "limit": 100,
         }
 
-        response = requests.get(url, params=params, timeout=10)
+        response = await client.get(url, params=params, timeout=10)
         response.raise_for_status()
 
-        data = response.json()
-        return data.get("data", [])
+        data = orjson.loads(response.content)
+        traces = data.get("data", [])
+        _trace_cache[key] = traces
+        return traces
 
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"Error fetching traces from Jaeger: {e}")
         return []
     except Exception as e:
@@ -80,35 +104,40 @@ def _resolve_process(span: Dict[str, Any], processes: Dict[str, Any]) -> Dict[st
     return span
 
 
-def is_error_span(span: Dict[str, Any]) -> bool:
+def _http_status_is_error(val: Any) -> bool:
+    """True if an http.status_code tag value is >= 400."""
+    if isinstance(val, (int, float)):
+        return val >= 400
+    if isinstance(val, str):
+        try:
+            return int(val) >= 400
+        except ValueError:
+            return False
+    return False
+
+
+def is_error_span(span: Dict[str, Any], tag_map: Optional[Dict[str, Any]] = None) -> bool:
     """
     Check if a span represents an error.
 
     Checks both:
     - OTLP status code (2 = ERROR)
     - HTTP status code >= 400 in tags
+
+    Callers that already built a {key: value} map of the span's tags can
+    pass it as ``tag_map`` to skip rebuilding it.
     """
     # Check OTLP status code
-    status = span.get("status", {})
-    status_code = status.get("code")
-    if status_code == 2 or status_code == "ERROR":
-        return True
+    status = span.get("status")
+    if status:
+        status_code = status.get("code")
+        if status_code == 2 or status_code == "ERROR":
+            return True
 
     # Check HTTP status code in tags
-    tags = span.get("tags", [])
-    for tag in tags:
-        if tag.get("key") == "http.status_code":
-            val = tag.get("value")
-            if isinstance(val, (int, float)) and val >= 400:
-                return True
-            if isinstance(val, str):
-                try:
-                    if int(val) >= 400:
-                        return True
-                except (ValueError, TypeError):
-                    pass
-
-    return False
+    if tag_map is None:
+        tag_map = {t.get("key"): t.get("value") for t in span.get("tags") or ()}
+    return _http_status_is_error(tag_map.get("http.status_code"))
 
 
 def get_failed_spans(traces: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -129,7 +158,8 @@ def get_failed_spans(traces: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
             processes = trace.get("processes", {})
 
             for span in spans:
-                if is_error_span(span):
+                tag_map = {t.get("key"): t.get("value") for t in span.get("tags") or ()}
+                if is_error_span(span, tag_map):
                     resolved = _resolve_process(span, processes)
                     failed_spans.append(resolved)
 
@@ -140,9 +170,21 @@ def get_failed_spans(traces: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return failed_spans
 
 
+def fetch_traces_sync(service_name: str, minutes_ago: int = 5) -> List[Dict[str, Any]]:
+    """
+    Blocking fetch_traces for scripts and smoke tests outside an event loop.
+    Uses a one-off AsyncClient; the API itself shares app.state.http.
+    """
+    async def _fetch() -> List[Dict[str, Any]]:
+        async with httpx.AsyncClient() as client:
+            return await fetch_traces(client, service_name, minutes_ago)
+
+    return asyncio.run(_fetch())
+
+
 if __name__ == "__main__":
     print(f"Testing Jaeger client with URL: {JAEGER_URL}")
-    traces = fetch_traces("service-a", minutes_ago=10)
+    traces = fetch_traces_sync("service-a", minutes_ago=10)
     print(f"Fetched {len(traces)} traces")
 
     failed = get_failed_spans(traces)
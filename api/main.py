@@ -7,17 +7,24 @@ Prometheon RCA API v2.0 — Phase 2A
   - All Phase 1.5 endpoints preserved
 """
 
-import subprocess
+import asyncio
 import json
 import os
 import sys
 from pathlib import Path
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from contextlib import asynccontextmanager
 
+import httpx
+import joblib
+import numpy as np
+from cachetools import TTLCache
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from fastapi.staticfiles import StaticFiles
+from pydantic import BaseModel, ConfigDict
 from sqlalchemy import select, desc
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -32,7 +39,7 @@ from cache import (
     invalidate_tenant_cache,
     close_redis,
 )
-from jaeger_client import fetch_traces, get_failed_spans
+from jaeger_client import fetch_traces, get_failed_spans, invalidate_trace_cache
 
 # ---------------------------------------------------------------------------
 # Import the RCA analyzer from /scripts (Docker volume mount)
@@ -50,6 +57,56 @@ except ImportError as exc:
     print(f"[rca-api] WARNING: Could not import root_cause_analyzer: {exc}")
     print(f"[rca-api] Falling back to basic trace statistics.")
 
+_report_generator_available = False
+try:
+    from report_generator import load_baseline, generate_markdown_report
+    _report_generator_available = True
+except ImportError as exc:
+    print(f"[rca-api] WARNING: Could not import report_generator: {exc}")
+
+MODEL_PATH = os.getenv("MODEL_PATH", "/models/failure_predictor.pkl")
+COLS_PATH = os.getenv("COLS_PATH", "/models/feature_columns.json")
+BASELINE_PATH = "/data/baselines/normal_baseline.yaml"
+REPORTS_DIR = Path("/reports")
+
+# Report listing is polled by dashboards; rescan the directory at most every 5s
+_reports_cache: TTLCache = TTLCache(maxsize=1, ttl=5)
+
+
+# ---------------------------------------------------------------------------
+# Response schemas
+# ---------------------------------------------------------------------------
+# These type the OpenAPI schema (response_model=). The handlers return an
+# ORJSONResponse of the matching dict, which FastAPI sends as is, so no
+# per-request validation or jsonable_encoder pass runs on the hot path.
+class AffectedService(BaseModel):
+    service_name: str
+    failure_probability: float
+    reason: str
+
+
+class PredictImpactResponse(BaseModel):
+    predicted_failure_probability: float
+    affected_services: List[AffectedService]
+    recommendation: str
+
+
+class AnalyzeFailureResponse(BaseModel):
+    # The root cause analyzer may add fields (project_name, ...); keep them
+    model_config = ConfigDict(extra="allow")
+
+    test_id: str
+    status: str
+    error_rate: float
+    total_traces: int
+    failed_traces: int
+    service: str
+    time_window_minutes: int
+    root_causes: List[Any]
+    ai_summary: str
+    recommendations: List[Any]
+    result_id: Optional[str] = None
+
 
 # ---------------------------------------------------------------------------
 # Lifespan — startup + shutdown hooks
@@ -60,8 +117,24 @@ async def lifespan(app: FastAPI):
     print("[rca-api] Initializing database tables...")
     await init_db()
     print("[rca-api] Database ready.")
+    # One pooled client for outbound calls (Jaeger) shared by all requests
+    app.state.http = httpx.AsyncClient(
+        timeout=10.0,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    )
+    # Load the failure predictor once instead of per /api/predict-impact call
+    try:
+        app.state.model = joblib.load(MODEL_PATH)
+        with open(COLS_PATH) as f:
+            app.state.feature_cols = json.load(f)
+        print(f"[rca-api] Failure predictor loaded from {MODEL_PATH}")
+    except Exception as exc:
+        app.state.model = None
+        app.state.feature_cols = []
+        print(f"[rca-api] WARNING: Could not load failure predictor: {exc}")
     yield
     # Shutdown
+    await app.state.http.aclose()
     await close_db()
     await close_redis()
     print("[rca-api] Shutdown complete.")
@@ -70,7 +143,12 @@ async def lifespan(app: FastAPI):
 # ---------------------------------------------------------------------------
 # App
 # ---------------------------------------------------------------------------
-app = FastAPI(title="Prometheon RCA API", version="2.0.0", lifespan=lifespan)
+app = FastAPI(
+    title="Prometheon RCA API",
+    version="2.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -103,10 +181,10 @@ def health():
 
 
 # ---------------------------------------------------------------------------
-# 1. Predict Impact (wraps scripts/predict_failure.py)
+# 1. Predict Impact (model loaded at startup)
 # ---------------------------------------------------------------------------
-@app.post("/api/predict-impact")
-def predict_impact(payload: Dict[str, Any]):
+@app.post("/api/predict-impact", response_model=PredictImpactResponse)
+async def predict_impact(payload: Dict[str, Any]):
     """Predict failure impact using the trained ML model."""
     try:
         fault_type = payload.get("fault_type", "latency")
@@ -121,24 +199,13 @@ def predict_impact(payload: Dict[str, Any]):
             "toxic_active": 1,
         }
 
-        result = subprocess.run(
-            [
-                "python",
-                f"{SCRIPTS_DIR}/predict_failure.py",
-                "--model", "/models/failure_predictor.pkl",
-                "--cols", "/models/feature_columns.json",
-                "--row", json.dumps(features),
-            ],
-            capture_output=True,
-            text=True,
-            timeout=15,
-        )
-
-        if result.returncode != 0:
-            raise HTTPException(status_code=500, detail=f"Prediction script failed: {result.stderr}")
+        model = app.state.model
+        if model is None:
+            raise HTTPException(status_code=503, detail="Prediction model not loaded")
 
-        prediction = json.loads(result.stdout)
-        risk_score = prediction.get("risk_score", 0.0)
+        row = np.array([features[col] for col in app.state.feature_cols], dtype=np.float32)
+        proba = await asyncio.to_thread(model.predict_proba, row.reshape(1, -1))
+        risk_score = float(proba[0, 1])
 
         affected = []
         if "a_to_b" in fault_target:
@@ -155,16 +222,12 @@ def predict_impact(payload: Dict[str, Any]):
         else:
             recommendation = "Low risk. Safe to proceed."
 
-        return {
+        return ORJSONResponse({
             "predicted_failure_probability": round(risk_score, 3),
             "affected_services": affected,
             "recommendation": recommendation,
-        }
+        })
 
-    except json.JSONDecodeError as e:
-        raise HTTPException(status_code=500, detail=f"Failed to parse prediction: {e}")
-    except subprocess.TimeoutExpired:
-        raise HTTPException(status_code=504, detail="Prediction timed out")
     except HTTPException:
         raise
     except Exception as e:
@@ -174,7 +237,7 @@ def predict_impact(payload: Dict[str, Any]):
 # ---------------------------------------------------------------------------
 # 2. Analyze Failure — NOW with caching + persistence
 # ---------------------------------------------------------------------------
-@app.post("/api/analyze-failure")
+@app.post("/api/analyze-failure", response_model=AnalyzeFailureResponse)
 async def analyze_failure(
     payload: Dict[str, Any],
     current_user: Optional[dict] = Depends(get_current_user),
@@ -197,10 +260,10 @@ async def analyze_failure(
         cached = await get_cached_analysis(tenant_id, service, minutes)
         if cached:
             cached["_cached"] = True
-            return cached
+            return ORJSONResponse(cached)
 
         # 2. Fetch traces from Jaeger
-        traces = fetch_traces(jaeger_service, minutes)
+        traces = await fetch_traces(app.state.http, jaeger_service, minutes)
         failed_spans = get_failed_spans(traces)
 
         # 3. Run full RCA if analyzer is available
@@ -253,7 +316,7 @@ async def analyze_failure(
         # 5. Cache the result
         await set_cached_analysis(tenant_id, service, minutes, analysis)
 
-        return analysis
+        return ORJSONResponse(analysis)
 
     except HTTPException:
         raise
@@ -381,6 +444,7 @@ async def create_chaos_config(
 
     # Invalidate cache — new injection config may change analysis
     await invalidate_tenant_cache(tenant_id)
+    invalidate_trace_cache()
 
     return {"id": str(config.id), "name": config.name}
 
@@ -407,53 +471,74 @@ async def delete_chaos_config(
 
 
 # ---------------------------------------------------------------------------
-# 6. Generate Report (unchanged from Phase 1.5)
+# 6. Generate Report (calls scripts/report_generator.py in-process)
 # ---------------------------------------------------------------------------
+def _write_report(test_id: str) -> str:
+    baseline_data = load_baseline(BASELINE_PATH)
+    compare_data = load_baseline(BASELINE_PATH)
+    report = generate_markdown_report(
+        baseline_data, compare_data,
+        Path(BASELINE_PATH).name, Path(BASELINE_PATH).name,
+    )
+    filename = f"{test_id}_report.md"
+    REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+    (REPORTS_DIR / filename).write_text(report)
+    return filename
+
+
 @app.post("/api/generate-report")
-def generate_report(payload: Dict[str, Any]):
+async def generate_report(payload: Dict[str, Any]):
     try:
+        if not _report_generator_available:
+            raise HTTPException(status_code=500, detail="Report generator not loaded")
         test_id = payload.get("test_id", "latest")
-        result = subprocess.run(
-            [
-                "python",
-                f"{SCRIPTS_DIR}/report_generator.py",
-                "--baseline", "/data/baselines/normal_baseline.yaml",
-                "--compare", "/data/baselines/normal_baseline.yaml",
-                "--output", f"/reports/{test_id}_report.md",
-            ],
-            capture_output=True, text=True, timeout=30,
-        )
-        if result.returncode != 0:
-            raise HTTPException(status_code=500, detail=f"Report generation failed: {result.stderr}")
-        return {"filename": f"{test_id}_report.md"}
-    except subprocess.TimeoutExpired:
-        raise HTTPException(status_code=504, detail="Report generation timed out")
+        filename = await asyncio.to_thread(_write_report, test_id)
+        _reports_cache.clear()
+        return {"filename": filename}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Report error: {str(e)}")
 
 
+def _scan_reports() -> list:
+    """One scandir pass over the reports dir -> [(filename, mtime, size)]."""
+    if not REPORTS_DIR.exists():
+        return []
+    with os.scandir(REPORTS_DIR) as entries:
+        return [
+            (entry.name, st.st_mtime, st.st_size)
+            for entry in entries
+            if entry.name.endswith(".md") and entry.is_file()
+            for st in (entry.stat(),)
+        ]
+
+
 @app.get("/api/reports")
-def list_reports():
+async def list_reports():
     try:
-        reports_dir = Path("/reports")
-        if not reports_dir.exists():
-            return []
-        reports = []
-        for file in reports_dir.glob("*.md"):
-            stat = file.stat()
-            reports.append({
-                "filename": file.name,
-                "created_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                "size_mb": round(stat.st_size / 1_000_000, 2),
-            })
+        scanned = _reports_cache.get("reports")
+        if scanned is None:
+            scanned = await asyncio.to_thread(_scan_reports)
+            _reports_cache["reports"] = scanned
+        reports = [
+            {
+                "filename": name,
+                "created_at": datetime.fromtimestamp(mtime).isoformat(),
+                "size_mb": round(size / 1_000_000, 2),
+            }
+            for name, mtime, size in scanned
+        ]
         reports.sort(key=lambda x: x["created_at"], reverse=True)
         return reports
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list reports: {str(e)}")
 
 
+# Report downloads (/api/reports/<filename>) are served straight from disk
+app.mount("/api/reports", StaticFiles(directory=REPORTS_DIR, check_dir=False), name="reports")
+
+
 # ---------------------------------------------------------------------------
 if __name__ == "__main__":
     import uvicorn
@@ -8,6 +8,7 @@ from typing import Dict, Any, List, Optional
 import httpx
 from fastapi import APIRouter, HTTPException, Depends
 from auth import get_current_user
+from jaeger_client import invalidate_trace_cache
 
 router = APIRouter(prefix="/api/sandbox", tags=["sandbox-proxy"])
 PROMETHEUS_URL = os.getenv("PROMETHEUS_URL", "http://prometheus:9090")
@@ -109,6 +110,7 @@ async def add_toxic(sandbox_id: str, payload: Dict[str, Any], current_user: dict
         resp = await client.post(f"{toxi_url}/proxies/{payload.get('proxy','')}/toxics", json=payload.get("toxic",{}))
         if resp.status_code not in (200,201):
             raise HTTPException(status_code=resp.status_code, detail=resp.text)
+        invalidate_trace_cache()
         return resp.json()
 
 @router.delete("/{sandbox_id}/toxics/remove/{proxy}/{toxic}")
@@ -119,6 +121,7 @@ async def remove_toxic(sandbox_id: str, proxy: str, toxic: str, current_user: di
         resp = await client.delete(f"{toxi_url}/proxies/{proxy}/toxics/{toxic}")
         if resp.status_code not in (200,204):
             raise HTTPException(status_code=resp.status_code, detail=resp.text)
+        invalidate_trace_cache()
         return {"deleted": True}
 
 # --- Replay ---
@@ -84,7 +84,7 @@ test_endpoint \
 # Test 6: Fetch traces function
 test_endpoint \
     "fetch_traces() returns data" \
-    "docker exec rca-api python -c \"from jaeger_client import fetch_traces; traces = fetch_traces('service-a', 10); print(f'traces:{len(traces)}')\"" \
+    "docker exec rca-api python -c \"from jaeger_client import fetch_traces_sync; traces = fetch_traces_sync('service-a', 10); print(f'traces:{len(traces)}')\"" \
     "traces:"
 
 # Test 7: CORS headers
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Export a trained failure prediction model to ONNX for predict_failure.py.
+
+Usage example:
+python scripts/convert_model.py --model models/failure_predictor.pkl \
+  --cols models/feature_columns.json --out models/failure_predictor.onnx
+"""
+
+import argparse
+import json
+import sys
+
+import joblib
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
+
+
+def convert(model, n_features):
+    """Convert a fitted sklearn classifier to an ONNX model with a plain probability tensor."""
+    return convert_sklearn(
+        model,
+        initial_types=[('X', FloatTensorType([None, n_features]))],
+        options={id(model): {'zipmap': False}},
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export failure prediction model to ONNX')
+    parser.add_argument('--model', required=True, help='Path to trained model (.pkl)')
+    parser.add_argument('--cols', required=True, help='Path to feature columns JSON')
+    parser.add_argument('--out', required=True, help='Path to write the .onnx model')
+
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    with open(args.cols, 'r') as f:
+        feature_cols = json.load(f)
+
+    onx = convert(model, len(feature_cols))
+    with open(args.out, 'wb') as f:
+        f.write(onx.SerializeToString())
+
+    print(f"Wrote ONNX model to {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,15 +1,19 @@
-import httpx, time
+import asyncio
+import httpx
 
 URL = "http://localhost:8081/checkout"
+REQUESTS = 30
+CONCURRENCY = 10
 
-ok = 0
-for i in range(30):
-    try:
-        r = httpx.get(URL, timeout=5.0)
-        if r.status_code == 200:
-            ok += 1
-    except Exception:
-        pass
-    time.sleep(0.05)
-
-print("done, ok:", ok)
+async def hit(client, sem):
+    async with sem:
+        return await client.get(URL)
+
+async def main():
+    sem = asyncio.Semaphore(CONCURRENCY)
+    async with httpx.AsyncClient(timeout=5.0) as client:
+        results = await asyncio.gather(*[hit(client, sem) for _ in range(REQUESTS)], return_exceptions=True)
+    ok = sum(1 for r in results if not isinstance(r, Exception) and r.status_code == 200)
+    print("done, ok:", ok)
+
+asyncio.run(main())
@@ -2,20 +2,47 @@
 """
 Predict failure risk using trained model.
 Takes feature values as JSON and returns risk score + prediction.
+Accepts either the joblib .pkl from train_model.py or an .onnx export from
+convert_model.py (run with onnxruntime).
 """
 
 import argparse
 import json
 import sys
+from functools import lru_cache
+from operator import itemgetter
 
 import joblib
 import numpy as np
+import orjson
+
+
+# Features are float32 end to end: train_model fits on float32 and the
+# ONNX export takes a float32 input tensor
+FEATURE_DTYPE = np.float32
+
+
+class OnnxModel:
+    """onnxruntime session exposing the same predict_proba() as the sklearn model."""
+
+    def __init__(self, model_path):
+        import onnxruntime as ort
+        self.session = ort.InferenceSession(model_path, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict_proba(self, features):
+        # outputs are (label, probabilities); the export disables zipmap
+        _, proba = self.session.run(None, {self.input_name: np.asarray(features, dtype=FEATURE_DTYPE)})
+        return proba
 
 
 def load_model_and_features(model_path, cols_path):
     """Load trained model and feature column order."""
     try:
-        model = joblib.load(model_path)
+        if str(model_path).endswith('.onnx'):
+            model = OnnxModel(model_path)
+        else:
+            model = joblib.load(model_path)
         with open(cols_path, 'r') as f:
             feature_cols = json.load(f)
         return model, feature_cols
@@ -27,41 +54,157 @@ def load_model_and_features(model_path, cols_path):
         sys.exit(1)
 
 
-def parse_row_input(row_str, feature_cols):
-    """Parse JSON string of features into ordered array."""
+@lru_cache(maxsize=8)
+def _prep_cols(cols):
+    """Per-column-tuple helpers, built once: an itemgetter pulling the `cols` values
+    out of a row dict in order (one C call), and the columns as a frozenset."""
+    return itemgetter(*cols), frozenset(cols)
+
+
+def parse_row_input(row_str, feature_cols, out=None):
+    """Parse JSON string of features into ordered array.
+    Fills `out`, a preallocated (1, n_features) array, in place when given."""
     try:
-        row_dict = json.loads(row_str)
-    except json.JSONDecodeError as e:
+        row_dict = orjson.loads(row_str)
+    except orjson.JSONDecodeError as e:
         print(f"Error: Invalid JSON - {e}", file=sys.stderr)
         sys.exit(1)
     
-    # Check for missing features
-    missing = set(feature_cols) - set(row_dict.keys())
-    if missing:
+    # Extract features in correct order, straight into the (1, n) row; the
+    # missing-feature set is only worked out when a lookup actually fails
+    get_values, cols_set = _prep_cols(tuple(feature_cols))
+    features = np.empty((1, len(feature_cols)), dtype=FEATURE_DTYPE) if out is None else out
+    try:
+        features[0] = get_values(row_dict)
+    except KeyError:
+        missing = set(cols_set.difference(row_dict))
         print(f"Error: Missing required features: {missing}", file=sys.stderr)
         sys.exit(1)
+    return features
+
+
+def parse_rows_input(rows_str, feature_cols):
+    """Parse a JSON array of feature objects into one (N, n_features) matrix."""
+    try:
+        rows = orjson.loads(rows_str)
+    except orjson.JSONDecodeError as e:
+        print(f"Error: Invalid JSON - {e}", file=sys.stderr)
+        sys.exit(1)
+    
+    if not isinstance(rows, list):
+        print("Error: --rows must be a JSON array of objects", file=sys.stderr)
+        sys.exit(1)
+    
+    _, cols_set = _prep_cols(tuple(feature_cols))
+    for i, row_dict in enumerate(rows):
+        # dict views compare against a set without building one
+        if not row_dict.keys() >= cols_set:
+            missing = set(cols_set.difference(row_dict))
+            print(f"Error: Row {i} missing required features: {missing}", file=sys.stderr)
+            sys.exit(1)
     
-    # Extract features in correct order
-    features = [row_dict[col] for col in feature_cols]
-    return np.array(features).reshape(1, -1)
+    n = len(feature_cols)
+    flat = np.fromiter(
+        (row_dict[col] for row_dict in rows for col in feature_cols),
+        dtype=FEATURE_DTYPE,
+        count=len(rows) * n,
+    )
+    return flat.reshape(len(rows), n)
 
 
-def predict(model, features):
-    """Make prediction and get risk score."""
-    # Get probability of failure (class 1)
-    risk_score = model.predict_proba(features)[0, 1]
+# Risk above this is labelled a failure. At 0.5 this is exactly the two-class
+# argmax model.predict() would return, so predict() is never called.
+DEFAULT_THRESHOLD = 0.5
+
+
+# Batches at least this large are scored with all cores (models are saved with n_jobs=1)
+PARALLEL_BATCH_ROWS = 10_000
+
+
+def predict_batch(model, features, threshold=DEFAULT_THRESHOLD):
+    """Score every row of an (N, n_features) matrix with a single predict_proba call."""
+    if len(features) >= PARALLEL_BATCH_ROWS and getattr(model, 'n_jobs', None) == 1:
+        model.n_jobs = -1
+        try:
+            risk_scores = model.predict_proba(features)[:, 1]
+        finally:
+            model.n_jobs = 1
+    else:
+        risk_scores = model.predict_proba(features)[:, 1]
+    labels = (risk_scores > threshold).astype(np.int8)
+    return risk_scores, labels
+
+
+def predict(model, features, threshold=DEFAULT_THRESHOLD):
+    """Make prediction and get risk score.
+    A single row gives a Python (float, int); more rows give predict_batch's arrays."""
+    if len(features) != 1:
+        return predict_batch(model, features, threshold)
+    
+    # Probability of failure (class 1), unboxed once at the end
+    risk_score = model.predict_proba(features)[0, 1].item()
     
-    # Get binary prediction
-    label_hat = int(model.predict(features)[0])
+    # Binary prediction derived from the same output
+    label_hat = int(risk_score > threshold)
     
     return risk_score, label_hat
 
 
+class Predictor:
+    """Model and feature order loaded once, then reused for many rows.
+
+    Recently seen feature rows are answered from an LRU cache without
+    running the model again."""
+
+    def __init__(self, model, feature_cols, cache_size=1024, threshold=DEFAULT_THRESHOLD):
+        self.model = model
+        self.cols = feature_cols
+        self.threshold = threshold
+        self._values, _ = _prep_cols(tuple(feature_cols))
+        self._buf = np.empty((1, len(feature_cols)), dtype=FEATURE_DTYPE)
+        self._score = lru_cache(maxsize=cache_size)(self._score_values)
+
+    def _score_values(self, values):
+        self._buf[0, :] = values
+        return predict(self.model, self._buf, self.threshold)
+
+    def predict_row(self, row_dict):
+        """Score one {feature: value} dict. Raises KeyError on a missing feature."""
+        # the ordered value tuple doubles as the cache key
+        return self._score(self._values(row_dict))
+
+
+def serve(predictor, stdin=None, stdout=None):
+    """Score NDJSON rows from stdin, writing one JSON result line per input row."""
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    for line in stdin:
+        if not line.strip():
+            continue
+        try:
+            risk_score, label_hat = predictor.predict_row(orjson.loads(line))
+            result = {"risk_score": risk_score, "label_hat": label_hat}
+        except orjson.JSONDecodeError as e:
+            result = {"error": f"Invalid JSON - {e}"}
+        except KeyError as e:
+            result = {"error": f"Missing required feature: {e}"}
+        except (TypeError, ValueError) as e:
+            result = {"error": f"Invalid feature value - {e}"}
+        stdout.write(json.dumps(result) + "\n")
+        stdout.flush()
+
+
 def main():
     parser = argparse.ArgumentParser(description='Predict failure risk')
-    parser.add_argument('--model', required=True, help='Path to trained model (.pkl)')
+    parser.add_argument('--model', required=True, help='Path to trained model (.pkl or .onnx)')
     parser.add_argument('--cols', required=True, help='Path to feature columns JSON')
-    parser.add_argument('--row', required=True, help='JSON string with feature values')
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--row', help='JSON string with feature values')
+    mode.add_argument('--rows', help='JSON array of feature objects, scored in one batch')
+    mode.add_argument('--serve', action='store_true',
+                      help='Keep the model loaded and score NDJSON rows read from stdin')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Risk score above which label_hat is 1 (default: {DEFAULT_THRESHOLD})')
     parser.add_argument('--verbose', action='store_true', help='Print verbose output')
     
     args = parser.parse_args()
@@ -74,18 +217,29 @@ def main():
     if args.verbose:
         print(f"Feature columns: {feature_cols}", file=sys.stderr)
     
+    if args.serve:
+        serve(Predictor(model, feature_cols, threshold=args.threshold))
+        return 0
+    
+    if args.rows is not None:
+        features = parse_rows_input(args.rows, feature_cols)
+        risk_scores, labels = predict_batch(model, features, args.threshold)
+        for risk_score, label_hat in zip(risk_scores.tolist(), labels.tolist()):
+            print(json.dumps({"risk_score": risk_score, "label_hat": label_hat}))
+        return 0
+    
     # Parse input
     if args.verbose:
         print(f"Parsing input: {args.row}", file=sys.stderr)
     features = parse_row_input(args.row, feature_cols)
     
     # Predict
-    risk_score, label_hat = predict(model, features)
+    risk_score, label_hat = predict(model, features, args.threshold)
     
     # Output result as JSON
     result = {
-        "risk_score": float(risk_score),
-        "label_hat": int(label_hat)
+        "risk_score": risk_score,
+        "label_hat": label_hat
     }
     
     print(json.dumps(result))
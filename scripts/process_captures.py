@@ -2,55 +2,78 @@
 """
 Process OTLP capture files and add duration field for baseline generation.
 Reads OTLP NDJSON format and outputs spans with duration in nanoseconds.
+Paths ending in .zst are read/written as zstd-compressed NDJSON.
 """
 
-import json
+import io
 from pathlib import Path
 
+import orjson
+
 CAPTURE_IN = Path("data/captures/capture_001.ndjson")
 CAPTURE_BACKUP = Path("data/captures/capture_001_otlp.ndjson")
 CAPTURE_OUT = Path("data/captures/capture_001.ndjson")
 
+# Output is written through a 1 MiB buffer rather than a syscall per span
+WRITE_BUFFER_BYTES = 1 << 20
+ZSTD_LEVEL = 3
+
+def open_capture(path):
+    """Open an NDJSON capture for binary line iteration; .zst is decompressed as it streams."""
+    path = Path(path)
+    if path.suffix != '.zst':
+        return path.open('rb')
+    import zstandard
+    return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(path.open('rb')))
+
+def create_capture(path):
+    """Open an NDJSON capture for binary writing; .zst is compressed as it streams."""
+    path = Path(path)
+    if path.suffix != '.zst':
+        return path.open('wb', buffering=WRITE_BUFFER_BYTES)
+    import zstandard
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=-1).stream_writer(path.open('wb'))
+
 def process_otlp_to_spans(input_file, output_file):
     """Convert OTLP format to individual spans with duration."""
     spans_written = 0
+    dumps = orjson.dumps
+    append_newline = orjson.OPT_APPEND_NEWLINE
     
-    with input_file.open('r') as fin, output_file.open('w') as fout:
+    # binary in/out: orjson parses bytes directly and dumps straight to bytes
+    with open_capture(input_file) as fin, create_capture(output_file) as fout:
+        write = fout.write
         for line in fin:
-            line = line.strip()
-            if not line:
-                continue
-            
+            # blank lines fail to parse and are skipped like any bad line
             try:
-                otlp_data = json.loads(line)
-            except json.JSONDecodeError:
+                otlp_data = orjson.loads(line)
+            except orjson.JSONDecodeError:
                 continue
             
             # Extract spans from OTLP format
-            resource_spans = otlp_data.get('resourceSpans', [])
-            for resource_span in resource_spans:
-                scope_spans = resource_span.get('scopeSpans', [])
-                for scope_span in scope_spans:
-                    spans = scope_span.get('spans', [])
-                    for span in spans:
-                        # Calculate duration from start and end times
-                        start_time = int(span.get('startTimeUnixNano', 0))
-                        end_time = int(span.get('endTimeUnixNano', 0))
-                        duration = end_time - start_time
+            for resource_span in otlp_data.get('resourceSpans', []):
+                for scope_span in resource_span.get('scopeSpans', []):
+                    for span in scope_span.get('spans', []):
+                        get = span.get
+                        # Calculate duration from start and end times. Kept as a
+                        # scalar op: the per-span cost is orjson parsing, and
+                        # batching spans into NumPy/JIT columns measured slower
+                        # (batches stay alive across GC passes).
+                        start_time = int(get('startTimeUnixNano', 0))
+                        end_time = int(get('endTimeUnixNano', 0))
                         
-                        # Create simplified span object with duration
-                        processed_span = {
-                            'traceId': span.get('traceId'),
-                            'spanId': span.get('spanId'),
-                            'name': span.get('name'),
-                            'duration': duration,  # in nanoseconds
+                        # Simplified span object with duration (in nanoseconds);
+                        # same literal key order for every span
+                        write(dumps({
+                            'traceId': get('traceId'),
+                            'spanId': get('spanId'),
+                            'name': get('name'),
+                            'duration': end_time - start_time,
                             'startTimeUnixNano': start_time,
                             'endTimeUnixNano': end_time,
-                            'status': span.get('status', {}),
-                            'attributes': span.get('attributes', [])
-                        }
-                        
-                        fout.write(json.dumps(processed_span) + '\n')
+                            'status': get('status', {}),
+                            'attributes': get('attributes', []),
+                        }, option=append_newline))
                         spans_written += 1
     
     return spans_written
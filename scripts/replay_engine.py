@@ -1,68 +1,117 @@
 import argparse
-import json
+import asyncio
 import random
 import time
-import requests
+import httpx
+import orjson
 from pathlib import Path
 
-def load_capture(path):
-    """Load NDJSON capture file and return a list of JSON objects."""
-    entries = []
-    with open(path, "r") as f:
+from process_captures import open_capture
+
+# Progress lines printed over a whole replay (instead of one per request)
+PROGRESS_STEPS = 20
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+def iter_capture(path):
+    """Lazily yield the JSON objects of an NDJSON capture file (optionally .zst)."""
+    with open_capture(path) as f:
         for line in f:
-            line = line.strip()
-            if not line:
-                continue
+            # blank lines fail to parse and are skipped like any bad line
             try:
-                obj = json.loads(line)
-                entries.append(obj)
-            except json.JSONDecodeError:
+                yield orjson.loads(line)
+            except orjson.JSONDecodeError:
                 continue
-    return entries
 
 
-def replay_requests(capture, count, output_path, base_url="http://localhost:8081/checkout"):
-    """Replay captured requests to service-a and save results."""
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    results = []
-
-    print(f"Replaying {count} requests to {base_url} ...")
-
-    for i in range(count):
-        # Randomly select a captured span to replay
-        sample = random.choice(capture)
-        payload = extract_payload(sample)
-
+def load_capture(path):
+    """Load NDJSON capture file (optionally .zst) and return a list of JSON objects."""
+    return list(iter_capture(path))
+
+
+def sample_capture(path, k, rng=random):
+    """Uniformly sample up to k capture entries in one pass (reservoir sampling).
+    Memory stays O(k) however large the capture is."""
+    reservoir = []
+    for i, entry in enumerate(iter_capture(path)):
+        if i < k:
+            reservoir.append(entry)
+        else:
+            j = rng.randrange(i + 1)
+            if j < k:
+                reservoir[j] = entry
+    return reservoir
+
+
+async def replay_one(client, sem, i, base_url, payload, when):
+    """POST captured payload i at its scheduled start time and return its result record."""
+    await asyncio.sleep(max(0.0, when - time.monotonic()))
+    async with sem:
         try:
-            start = time.time()
-            resp = requests.get(base_url, timeout=10)
-            duration_ms = (time.time() - start) * 1000
+            start = time.monotonic()
+            resp = await client.post(base_url, content=orjson.dumps(payload), headers=JSON_HEADERS)
+            duration_ms = (time.monotonic() - start) * 1000
 
-            result = {
+            return {
                 "index": i + 1,
                 "url": base_url,
                 "status_code": resp.status_code,
                 "duration_ms": round(duration_ms, 2),
-                "success": resp.ok,
+                "success": resp.is_success,
             }
-            results.append(result)
-            print(f"[{i+1}/{count}] {resp.status_code} - {duration_ms:.1f}ms")
 
         except Exception as e:
-            result = {"index": i + 1, "url": base_url, "error": str(e)}
-            results.append(result)
-            print(f"[{i+1}/{count}] ERROR: {e}")
+            return {"index": i + 1, "url": base_url, "error": str(e)}
+
+
+async def replay_requests_async(capture, count, output_path, base_url, concurrency, rate):
+    """Issue `count` requests at up to `rate` per second, at most `concurrency` in flight.
+    Each result is appended to `output_path` as NDJSON as soon as it completes."""
+    # Draw every captured payload to replay up front, in one RNG call; request
+    # i sends payloads[i] as its body
+    payloads = random.choices(prebuild_payloads(capture), k=count)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    sem = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(timeout=10.0, limits=limits) as client:
+        t0 = time.monotonic()
+        tasks = []
+        for i in range(count):
+            when = t0 + (i / rate if rate > 0 else 0.0)
+            tasks.append(replay_one(client, sem, i, base_url, payloads[i], when))
+
+        # errors are reported as they happen; successes only as periodic progress
+        report_every = max(1, count // PROGRESS_STEPS)
+        ok = 0
+        with open(output_path, "wb", buffering=1 << 20) as out:
+            for done, finished in enumerate(asyncio.as_completed(tasks), 1):
+                result = await finished
+                out.write(orjson.dumps(result, option=orjson.OPT_APPEND_NEWLINE))
+                if "error" in result:
+                    print(f"[{result['index']}/{count}] ERROR: {result['error']}")
+                elif result["success"]:
+                    ok += 1
+                if done % report_every == 0 or done == count:
+                    print(f"[{done}/{count}] completed, {ok} ok")
+
+
+def replay_requests(capture, count, output_path, base_url="http://localhost:8081/checkout",
+                    concurrency=10, rate=5.0):
+    """Replay captured request payloads to service-a and save results."""
+    output_path.parent.mkdir(parents=True, exist_ok=True)
 
-        time.sleep(0.2)  # small delay between requests
+    print(f"Replaying {count} requests to {base_url} ...")
 
-    # Save replay results
-    with open(output_path, "w") as out:
-        for r in results:
-            out.write(json.dumps(r) + "\n")
+    # results are streamed to output_path in completion order (see "index")
+    asyncio.run(replay_requests_async(capture, count, output_path, base_url, concurrency, rate))
 
     print(f"\n✅ Replay complete. Results saved to {output_path}")
 
 
+def prebuild_payloads(capture):
+    """Extract each capture entry's payload once; replays then just pick from the list."""
+    return [extract_payload(sample) for sample in capture]
+
+
 def extract_payload(sample):
     """Try to extract HTTP request payload or simulate one if unavailable."""
     try:
@@ -75,7 +124,7 @@ def extract_payload(sample):
                         if a.get("key") == "http.request.body":
                             v = a.get("value", {}).get("stringValue")
                             if v:
-                                return json.loads(v)
+                                return orjson.loads(v)
     except Exception:
         pass
 
@@ -88,6 +137,10 @@ def main():
     parser.add_argument("--input", required=True, help="Input NDJSON capture file")
     parser.add_argument("--output", required=True, help="Output NDJSON replay file")
     parser.add_argument("--count", type=int, default=20, help="Number of requests to replay")
+    parser.add_argument("--concurrency", type=int, default=10, help="Max requests in flight")
+    parser.add_argument("--rate", type=float, default=5.0,
+                        help="Requests started per second (0 = as fast as possible)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for a reproducible replay")
     args = parser.parse_args()
 
     input_path = Path(args.input)
@@ -96,11 +149,16 @@ def main():
     if not input_path.exists():
         raise SystemExit(f"❌ Input capture not found: {input_path}")
 
-    capture = load_capture(input_path)
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    # replays draw at most --count distinct entries, so never hold more than that
+    capture = sample_capture(input_path, args.count)
     if not capture:
         raise SystemExit("❌ No valid entries found in capture file.")
 
-    replay_requests(capture, args.count, output_path)
+    replay_requests(capture, args.count, output_path,
+                    concurrency=args.concurrency, rate=args.rate)
 
 
 if __name__ == "__main__":
@@ -10,15 +10,25 @@ Usage:
 """
 
 import argparse
+import orjson
 import yaml
 from pathlib import Path
 from datetime import datetime
 
+# libyaml's C loader when PyYAML was built with it; pure-Python otherwise
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 
 def load_baseline(filepath):
-    """Load baseline YAML file."""
-    with open(filepath, 'r') as f:
-        return yaml.safe_load(f)
+    """Load baseline YAML file (or a pre-converted .json file)."""
+    path = Path(filepath)
+    if path.suffix == '.json':
+        return orjson.loads(path.read_bytes())
+    with open(path, 'r') as f:
+        return yaml.load(f, Loader=SafeLoader)
 
 
 def calculate_diff(baseline_val, compare_val):
@@ -9,57 +9,67 @@ Usage:
 
 import argparse
 import yaml
-import json
+import numpy as np
+import orjson
 import requests
 from pathlib import Path
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+
+# libyaml's C loader when PyYAML was built with it; pure-Python otherwise
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+# Shared keep-alive session so repeated alerts reuse the webhook connection
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
 
 
 def load_yaml(filepath):
-    """Load YAML file."""
-    with open(filepath, 'r') as f:
-        return yaml.safe_load(f)
+    """Load YAML file (or a pre-converted .json file)."""
+    path = Path(filepath)
+    if path.suffix == '.json':
+        return orjson.loads(path.read_bytes())
+    with open(path, 'r') as f:
+        return yaml.load(f, Loader=SafeLoader)
+
+
+# (baseline key, threshold key, default threshold, severity, metric, scale, message)
+# scale converts the baseline value into the threshold's unit before comparing
+ALERT_METRICS = (
+    ('p95_ms', 'latency_p95_ms', 500, 'warning', 'p95_latency', 1,
+     "p95 latency ({value:.2f}ms) exceeds threshold ({threshold}ms)"),
+    ('p50_ms', 'latency_p50_ms', 200, 'info', 'p50_latency', 1,
+     "p50 latency ({value:.2f}ms) exceeds threshold ({threshold}ms)"),
+    ('error_rate', 'error_rate_pct', 5, 'critical', 'error_rate', 100,
+     "Error rate ({value:.2f}%) exceeds threshold ({threshold}%)"),
+)
 
 
 def check_thresholds(baseline_data, thresholds):
     """Check if any metrics exceed thresholds."""
+    limits = [thresholds.get(tk, default) for _, tk, default, _, _, _, _ in ALERT_METRICS]
+    values = np.fromiter(
+        (baseline_data.get(bk, 0) * scale for bk, _, _, _, _, scale, _ in ALERT_METRICS),
+        dtype=np.float64,
+        count=len(ALERT_METRICS),
+    )
+    exceeded = values > np.asarray(limits, dtype=np.float64)
+    
+    # Only build alert records (and format messages) for metrics that fired
     alerts = []
-    
-    # Check p95 latency
-    p95_ms = baseline_data.get('p95_ms', 0)
-    p95_threshold = thresholds.get('latency_p95_ms', 500)
-    if p95_ms > p95_threshold:
-        alerts.append({
-            'severity': 'warning',
-            'metric': 'p95_latency',
-            'value': p95_ms,
-            'threshold': p95_threshold,
-            'message': f"p95 latency ({p95_ms:.2f}ms) exceeds threshold ({p95_threshold}ms)"
-        })
-    
-    # Check p50 latency
-    p50_ms = baseline_data.get('p50_ms', 0)
-    p50_threshold = thresholds.get('latency_p50_ms', 200)
-    if p50_ms > p50_threshold:
+    for i in np.flatnonzero(exceeded):
+        _, _, _, severity, metric, _, message = ALERT_METRICS[i]
+        value, threshold = float(values[i]), limits[i]
         alerts.append({
-            'severity': 'info',
-            'metric': 'p50_latency',
-            'value': p50_ms,
-            'threshold': p50_threshold,
-            'message': f"p50 latency ({p50_ms:.2f}ms) exceeds threshold ({p50_threshold}ms)"
-        })
-    
-    # Check error rate
-    error_rate = baseline_data.get('error_rate', 0)
-    error_rate_pct = error_rate * 100
-    error_threshold = thresholds.get('error_rate_pct', 5)
-    if error_rate_pct > error_threshold:
-        alerts.append({
-            'severity': 'critical',
-            'metric': 'error_rate',
-            'value': error_rate_pct,
-            'threshold': error_threshold,
-            'message': f"Error rate ({error_rate_pct:.2f}%) exceeds threshold ({error_threshold}%)"
+            'severity': severity,
+            'metric': metric,
+            'value': value,
+            'threshold': threshold,
+            'message': message.format(value=value, threshold=threshold)
         })
     
     return alerts
@@ -67,6 +77,9 @@ def check_thresholds(baseline_data, thresholds):
 
 def format_slack_message(alerts, baseline_name):
     """Format alerts as a Slack message payload."""
+    now = datetime.now()
+    ts = int(now.timestamp())
+    
     if not alerts:
         return {
             "text": "✅ All metrics within acceptable thresholds",
@@ -74,7 +87,7 @@ def format_slack_message(alerts, baseline_name):
                 "color": "good",
                 "title": "Performance Check",
                 "text": f"Baseline: {baseline_name}",
-                "ts": int(datetime.now().timestamp())
+                "ts": ts
             }]
         }
     
@@ -107,11 +120,11 @@ def format_slack_message(alerts, baseline_name):
                 },
                 {
                     "title": "Timestamp",
-                    "value": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    "value": now.strftime('%Y-%m-%d %H:%M:%S'),
                     "short": True
                 }
             ],
-            "ts": int(datetime.now().timestamp())
+            "ts": ts
         }]
     }
 
@@ -119,9 +132,9 @@ def format_slack_message(alerts, baseline_name):
 def send_slack_alert(webhook_url, payload):
     """Send alert to Slack webhook."""
     try:
-        response = requests.post(
+        response = SESSION.post(
             webhook_url,
-            json=payload,
+            data=orjson.dumps(payload),
             headers={'Content-Type': 'application/json'},
             timeout=10
         )
@@ -182,7 +195,7 @@ def main():
         slack_payload = format_slack_message(alerts, Path(args.baseline).name)
         
         print(f"Sending alert to Slack webhook: {webhook_url}")
-        print(f"Payload: {json.dumps(slack_payload, indent=2)}\n")
+        print(f"Payload: {orjson.dumps(slack_payload, option=orjson.OPT_INDENT_2).decode()}\n")
         
         success, message = send_slack_alert(webhook_url, slack_payload)
         if success:
@@ -1,55 +1,84 @@
-import os
-import json
-import tempfile
-from unittest import mock
+import asyncio
 
-import pytest
+import httpx
+import numpy as np
 
 from scripts import build_dataset
 
 
 class DummyResponse:
+    """Stand-in for the requests.Response that toxic_active reads from SESSION.get."""
     def __init__(self, payload):
         self._payload = payload
-        self.status_code = 200
-
 
     def raise_for_status(self):
         return None
 
-
     def json(self):
         return self._payload
-    
-def fake_prom_response_scalar(val):
-    return {"status": "success", "data": {"resultType": "vector", "result": [{"value": ["0", str(val)]}]}}
+
+def fake_prom_response_series(val, start, end, step):
+    values = [[t, str(val)] for t in range(start, end + 1, step)]
+    return {"status": "success", "data": {"resultType": "matrix", "result": [{"values": values}]}}
+
+def fake_prom_handler(request):
+    # Deterministic Prometheus range responses served through httpx.MockTransport
+    if "/api/v1/query_range" in request.url.path:
+        params = request.url.params
+        q = params.get("query", "")
+        span = (int(params["start"]), int(params["end"]), int(params["step"].rstrip("s")))
+        # return a small non-zero value for rate queries
+        if "rate(request_count_total" in q:
+            return httpx.Response(200, json=fake_prom_response_series(0.5, *span))
+        if "rate(error_count_total" in q:
+            return httpx.Response(200, json=fake_prom_response_series(0.0, *span))
+        if "histogram_quantile(0.50" in q:
+            return httpx.Response(200, json=fake_prom_response_series(0.02, *span))
+        if "histogram_quantile(0.95" in q:
+            return httpx.Response(200, json=fake_prom_response_series(0.05, *span))
+    return httpx.Response(200, json={"status": "success", "data": {"result": []}})
+
+def patch_async_client(monkeypatch, handler):
+    real_client = httpx.AsyncClient
+    def client_factory(*args, **kwargs):
+        kwargs["transport"] = httpx.MockTransport(handler)
+        return real_client(*args, **kwargs)
+    monkeypatch.setattr(build_dataset.httpx, "AsyncClient", client_factory)
 
 def test_build_rows_and_write(tmp_path, monkeypatch):
-    # Monkeypatch requests.get to return deterministic Prometheus and toxiproxy responses
+    # Monkeypatch the shared session to return deterministic toxiproxy responses
     def fake_get(url, params=None, timeout=5):
-        if "/api/v1/query" in url:
-            q = params.get("query", "")
-            # return a small non-zero value for rate queries
-            if "rate(request_count_total" in q:
-                return DummyResponse(fake_prom_response_scalar(0.5))
-            if "rate(error_count_total" in q:
-                return DummyResponse(fake_prom_response_scalar(0.0))
-            if "histogram_quantile(0.50" in q:
-                return DummyResponse(fake_prom_response_scalar(0.02))
-            if "histogram_quantile(0.95" in q:
-                return DummyResponse(fake_prom_response_scalar(0.05))
-            return DummyResponse({"status": "success", "data": {"result": []}})
-        if "/proxies/" in url:
-            # return proxy with no toxics
-            return DummyResponse({"name": "ab", "toxics": []})
-        return DummyResponse({"status": "success", "data": {"result": []}})
+        # every proxy has no toxics
+        return DummyResponse({"name": "ab", "toxics": []})
     
-    monkeypatch.setattr(build_dataset.requests, "get", fake_get)
+    monkeypatch.setattr(build_dataset.SESSION, "get", fake_get)
+    patch_async_client(monkeypatch, fake_prom_handler)
 
     out = tmp_path / "out.csv"
-    rows = build_dataset.build_rows("http://localhost:9090", window=60, minutes=2, service="service-a", threshold_p95_ms=700, toxiproxy_url="http://localhost:8474")
+    rows = asyncio.run(build_dataset.build_rows("http://localhost:9090", window=60, minutes=2, service="service-a", threshold_p95_ms=700, toxiproxy_url="http://localhost:8474"))
     assert len(rows) > 0
     build_dataset.write_csv(str(out), rows)
     assert out.exists()
     text = out.read_text()
-    assert "p95_ms" in text
\ No newline at end of file
+    assert "p95_ms" in text
+    assert rows[0]["req_rate"] == 0.5
+    assert all(r["p95_ms"] == 50.0 for r in rows)
+
+def test_build_rows_issues_one_range_query_per_metric(monkeypatch):
+    seen = []
+    def counting_handler(request):
+        seen.append(request.url.path)
+        return fake_prom_handler(request)
+    patch_async_client(monkeypatch, counting_handler)
+
+    rows = asyncio.run(build_dataset.build_rows("http://localhost:9090", window=60, minutes=10, service="service-a", threshold_p95_ms=700))
+    assert len(rows) >= 10
+    assert seen == ["/api/v1/query_range"] * 4
+
+
+def test_align_series_fills_gaps_with_zero():
+    grid = np.array([0, 60, 120, 180], dtype=np.int64)
+    ts = np.array([60.0, 180.0, 240.0])
+    vals = np.array([1.5, 2.5, 9.9])
+    col = build_dataset.align_series(grid, ts, vals)
+    assert col.tolist() == [0.0, 1.5, 0.0, 2.5]
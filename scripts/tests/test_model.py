@@ -20,66 +20,92 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 import train_model
 import predict_failure
 
+FEATURE_COLS = ['req_rate', 'err_rate', 'p50_ms', 'p95_ms', 'toxic_active']
 
-def create_sample_dataset(tmp_path, n_rows=50):
-    """Create a small synthetic dataset for testing."""
-    np.random.seed(42)
+
+def build_sample_dataframe(n_rows=50):
+    """Build a small synthetic dataset for testing."""
+    rng = np.random.default_rng(42)
     
     # Generate features
     data = {
         'timestamp': pd.date_range('2025-01-01', periods=n_rows, freq='1min'),
         'service': ['service-a'] * n_rows,
-        'req_rate': np.random.uniform(0.1, 1.0, n_rows),
-        'err_rate': np.random.uniform(0.0, 0.5, n_rows),
-        'p50_ms': np.random.uniform(10, 2000, n_rows),
-        'p95_ms': np.random.uniform(50, 3000, n_rows),
-        'toxic_active': np.random.choice([0, 1], n_rows),
-        'label': np.random.choice([0, 1], n_rows, p=[0.6, 0.4])
+        'req_rate': rng.uniform(0.1, 1.0, n_rows),
+        'err_rate': rng.uniform(0.0, 0.5, n_rows),
+        'p50_ms': rng.uniform(10, 2000, n_rows),
+        'p95_ms': rng.uniform(50, 3000, n_rows),
+        'toxic_active': rng.choice([0, 1], n_rows),
+        'label': rng.choice([0, 1], n_rows, p=[0.6, 0.4])
     }
     
-    df = pd.DataFrame(data)
-    csv_path = tmp_path / "test_dataset.csv"
-    df.to_csv(csv_path, index=False)
-    
+    return pd.DataFrame(data)
+
+
+@pytest.fixture(scope="session")
+def sample_df():
+    """The default 50-row dataset, built once per test session.
+    Tests pass it through train_model.load_dataframe, which never modifies it."""
+    return build_sample_dataframe(n_rows=50)
+
+
+@pytest.fixture(scope="session")
+def sample_csv(sample_df, tmp_path_factory):
+    """sample_df written to CSV once, for the tests that cover load_data itself."""
+    csv_path = tmp_path_factory.mktemp("data") / "test_dataset.csv"
+    sample_df.to_csv(csv_path, index=False)
     return csv_path
 
 
-def test_load_data(tmp_path):
+@pytest.fixture(scope="session")
+def fitted_rf(sample_df):
+    """A small RandomForest fitted once on sample_df, returned with its (X, y).
+    Shared read-only: tests that need a different model fit their own."""
+    df = train_model.load_dataframe(sample_df)
+    X, y = train_model.prepare_features(df, FEATURE_COLS)
+    model = RandomForestClassifier(n_estimators=10, random_state=42)
+    model.fit(X, y)
+    return model, X, y
+
+
+def test_load_data(sample_csv, sample_df):
     """Test data loading and NaN handling."""
-    csv_path = create_sample_dataset(tmp_path, n_rows=30)
-    
-    df = train_model.load_data(str(csv_path))
+    df = train_model.load_data(str(sample_csv))
     
     assert len(df) > 0
     assert 'label' in df.columns
     assert df.isna().sum().sum() == 0  # No NaN values
+    
+    # The in-memory entry point yields the same frame as the CSV path
+    pd.testing.assert_frame_equal(df, train_model.load_dataframe(sample_df))
 
 
-def test_prepare_features(tmp_path):
+def test_prepare_features(sample_df):
     """Test feature extraction."""
-    csv_path = create_sample_dataset(tmp_path, n_rows=30)
-    df = train_model.load_data(str(csv_path))
+    df = train_model.load_dataframe(sample_df)
     
     feature_cols = ['req_rate', 'err_rate', 'p50_ms', 'p95_ms', 'toxic_active']
     X, y = train_model.prepare_features(df, feature_cols)
     
     assert X.shape[0] == len(df)
     assert X.shape[1] == len(feature_cols)
+    # float32 in C order, holding the frame's values column for column
+    assert X.dtype == np.float32
+    assert X.flags['C_CONTIGUOUS']
+    np.testing.assert_array_equal(X, df[feature_cols].to_numpy(dtype=np.float32))
+    assert y.dtype == np.int8
     assert len(y) == len(df)
     assert set(np.unique(y)).issubset({0, 1})
 
 
-def test_train_model_end_to_end(tmp_path):
+def test_train_model_end_to_end(tmp_path, sample_df):
     """Test full training pipeline."""
-    # Create dataset
-    csv_path = create_sample_dataset(tmp_path, n_rows=50)
-    
     # Output paths
     model_path = tmp_path / "test_model.pkl"
     cols_path = tmp_path / "test_cols.json"
     
     # Load and prepare data
-    df = train_model.load_data(str(csv_path))
+    df = train_model.load_dataframe(sample_df)
     feature_cols = ['req_rate', 'err_rate', 'p50_ms', 'p95_ms', 'toxic_active']
     X, y = train_model.prepare_features(df, feature_cols)
     
@@ -108,17 +134,10 @@ def test_train_model_end_to_end(tmp_path):
     assert 0 <= metrics['roc_auc'] <= 1
 
 
-def test_predict_proba_works(tmp_path):
+def test_predict_proba_works(fitted_rf):
     """Test that model can make probability predictions."""
-    csv_path = create_sample_dataset(tmp_path, n_rows=50)
-    df = train_model.load_data(str(csv_path))
-    
-    feature_cols = ['req_rate', 'err_rate', 'p50_ms', 'p95_ms', 'toxic_active']
-    X, y = train_model.prepare_features(df, feature_cols)
-    
-    # Train simple model
-    model = RandomForestClassifier(n_estimators=10, max_depth=3, random_state=42)
-    model.fit(X, y)
+    feature_cols = FEATURE_COLS
+    model, X, y = fitted_rf
     
     # Test predict_proba
     proba = model.predict_proba(X[:5])
@@ -128,17 +147,10 @@ def test_predict_proba_works(tmp_path):
     assert np.all(proba >= 0) and np.all(proba <= 1)  # Valid probabilities
 
 
-def test_prediction_script(tmp_path):
+def test_prediction_script(tmp_path, fitted_rf):
     """Test the prediction script."""
-    # Create and train a model
-    csv_path = create_sample_dataset(tmp_path, n_rows=50)
-    df = train_model.load_data(str(csv_path))
-    
-    feature_cols = ['req_rate', 'err_rate', 'p50_ms', 'p95_ms', 'toxic_active']
-    X, y = train_model.prepare_features(df, feature_cols)
-    
-    model = RandomForestClassifier(n_estimators=10, random_state=42)
-    model.fit(X, y)
+    feature_cols = FEATURE_COLS
+    model, X, y = fitted_rf
     
     # Save model and columns
     model_path = tmp_path / "model.pkl"
@@ -172,19 +184,26 @@ def test_parse_row_input():
     assert features.shape == (1, 5)
     assert features[0, 0] == 0.5  # req_rate
     assert features[0, 4] == 1    # toxic_active
+    assert features.dtype == np.float32  # sklearn trees score in float32 anyway
 
 
-def test_model_with_edge_cases(tmp_path):
-    """Test model behavior with edge case inputs."""
-    # Create and train a model
-    csv_path = create_sample_dataset(tmp_path, n_rows=50)
-    df = train_model.load_data(str(csv_path))
-    
+def test_parse_row_input_fills_buffer_in_place():
+    """A preallocated row buffer is reused rather than a new array allocated."""
     feature_cols = ['req_rate', 'err_rate', 'p50_ms', 'p95_ms', 'toxic_active']
-    X, y = train_model.prepare_features(df, feature_cols)
-    
-    model = RandomForestClassifier(n_estimators=10, random_state=42)
-    model.fit(X, y)
+    buf = np.empty((1, len(feature_cols)), dtype=np.float32)
+
+    features = predict_failure.parse_row_input(
+        '{"req_rate":0.5,"err_rate":0.2,"p50_ms":150,"p95_ms":600,"toxic_active":1}', feature_cols, buf
+    )
+
+    assert features is buf
+    assert np.allclose(buf, [[0.5, 0.2, 150, 600, 1]])
+
+
+def test_model_with_edge_cases(fitted_rf):
+    """Test model behavior with edge case inputs."""
+    feature_cols = FEATURE_COLS
+    model, X, y = fitted_rf
     
     # Test edge cases
     edge_cases = [
@@ -196,13 +215,14 @@ def test_model_with_edge_cases(tmp_path):
         '{"req_rate":0.001,"err_rate":0.0,"p50_ms":1.0,"p95_ms":5.0,"toxic_active":0}',
     ]
     
-    for row_json in edge_cases:
-        features = predict_failure.parse_row_input(row_json, feature_cols)
-        risk_score, label_hat = predict_failure.predict(model, features)
-        
-        # Check outputs are valid
-        assert 0 <= risk_score <= 1, f"Invalid risk_score: {risk_score}"
-        assert label_hat in [0, 1], f"Invalid label: {label_hat}"
+    # Score all edge cases in one batched call
+    X_edge = np.vstack([predict_failure.parse_row_input(row_json, feature_cols) for row_json in edge_cases])
+    risk_scores, labels = predict_failure.predict_batch(model, X_edge)
+    
+    # Check outputs are valid
+    assert risk_scores.shape == (len(edge_cases),)
+    assert np.all((risk_scores >= 0) & (risk_scores <= 1)), f"Invalid risk_scores: {risk_scores}"
+    assert set(labels.tolist()).issubset({0, 1}), f"Invalid labels: {labels}"
 
 
 def test_missing_features_in_input():
@@ -226,17 +246,10 @@ def test_invalid_json_input():
         predict_failure.parse_row_input(invalid_json, feature_cols)
 
 
-def test_model_persistence(tmp_path):
+def test_model_persistence(tmp_path, fitted_rf):
     """Test that saved model produces same predictions after loading."""
-    csv_path = create_sample_dataset(tmp_path, n_rows=50)
-    df = train_model.load_data(str(csv_path))
-    
-    feature_cols = ['req_rate', 'err_rate', 'p50_ms', 'p95_ms', 'toxic_active']
-    X, y = train_model.prepare_features(df, feature_cols)
-    
-    # Train model
-    model = RandomForestClassifier(n_estimators=10, random_state=42)
-    model.fit(X, y)
+    feature_cols = FEATURE_COLS
+    model, X, y = fitted_rf
     
     # Get predictions before saving
     predictions_before = model.predict_proba(X[:5])
@@ -253,10 +266,9 @@ def test_model_persistence(tmp_path):
     assert np.allclose(predictions_before, predictions_after)
 
 
-def test_both_models_train(tmp_path):
+def test_both_models_train(sample_df):
     """Test that both LogisticRegression and RandomForest can train."""
-    csv_path = create_sample_dataset(tmp_path, n_rows=50)
-    df = train_model.load_data(str(csv_path))
+    df = train_model.load_dataframe(sample_df)
     
     feature_cols = ['req_rate', 'err_rate', 'p50_ms', 'p95_ms', 'toxic_active']
     X, y = train_model.prepare_features(df, feature_cols)
@@ -286,20 +298,75 @@ def test_both_models_train(tmp_path):
     assert rf_metrics['roc_auc'] >= 0.0
 
 
+def test_fit_and_score_matches_predict(sample_df):
+    """Test that metrics from thresholded predict_proba equal those from predict()."""
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.metrics import f1_score
+
+    df = train_model.load_dataframe(sample_df)
+    X, y = train_model.prepare_features(df, FEATURE_COLS)
+
+    for model in (LogisticRegression(solver='liblinear', random_state=42),
+                  RandomForestClassifier(n_estimators=20, random_state=42)):
+        fitted, metrics = train_model.fit_and_score(X, X, y, y, model)
+        assert metrics['f1'] == f1_score(y, fitted.predict(X), zero_division=0)
+
+
+def test_build_tree_model_kinds(sample_df):
+    """Test that --model rf/et build the matching ensemble and both train."""
+    from sklearn.ensemble import ExtraTreesClassifier
+    df = train_model.load_dataframe(sample_df)
+    
+    feature_cols = ['req_rate', 'err_rate', 'p50_ms', 'p95_ms', 'toxic_active']
+    X, y = train_model.prepare_features(df, feature_cols)
+    
+    rf_model, rf_name = train_model.build_tree_model('rf', 42)
+    et_model, et_name = train_model.build_tree_model('et', 42)
+    assert isinstance(rf_model, RandomForestClassifier) and rf_name == "RandomForestClassifier"
+    assert isinstance(et_model, ExtraTreesClassifier) and et_name == "ExtraTreesClassifier"
+    # trees are fit on every core; main() resets n_jobs to 1 before saving
+    assert rf_model.n_jobs == -1 and et_model.n_jobs == -1
+    
+    et_model.fit(X, y)
+    proba = et_model.predict_proba(X)[:, 1]
+    assert proba.shape == (len(X),)
+    assert np.all((proba >= 0) & (proba <= 1))
+
+
+def test_resume_tree_model_grows_saved_forest(tmp_path, fitted_rf):
+    """--resume keeps the saved trees and only fits the added ones."""
+    model, X, y = fitted_rf
+    model_path = tmp_path / "forest.pkl"
+    joblib.dump(model, str(model_path))
+    
+    resumed, name = train_model.resume_tree_model(str(model_path), add_trees=5)
+    assert name == "RandomForestClassifier (resumed)"
+    resumed.fit(X, y)
+    
+    assert len(resumed.estimators_) == len(model.estimators_) + 5
+    for old, kept in zip(model.estimators_, resumed.estimators_):
+        assert np.array_equal(old.tree_.threshold, kept.tree_.threshold)
+    
+    # A saved LogisticRegression cannot be grown
+    from sklearn.linear_model import LogisticRegression
+    joblib.dump(LogisticRegression().fit(X, y), str(model_path))
+    assert train_model.resume_tree_model(str(model_path), add_trees=5) is None
+
+
 def test_model_with_imbalanced_data(tmp_path):
     """Test model training with highly imbalanced classes."""
-    np.random.seed(42)
+    rng = np.random.default_rng(42)
     
     # Create imbalanced dataset (90% class 0, 10% class 1)
     data = {
         'timestamp': pd.date_range('2025-01-01', periods=100, freq='1min'),
         'service': ['service-a'] * 100,
-        'req_rate': np.random.uniform(0.1, 1.0, 100),
-        'err_rate': np.random.uniform(0.0, 0.5, 100),
-        'p50_ms': np.random.uniform(10, 2000, 100),
-        'p95_ms': np.random.uniform(50, 3000, 100),
-        'toxic_active': np.random.choice([0, 1], 100),
-        'label': np.random.choice([0, 1], 100, p=[0.9, 0.1])  # Imbalanced
+        'req_rate': rng.uniform(0.1, 1.0, 100),
+        'err_rate': rng.uniform(0.0, 0.5, 100),
+        'p50_ms': rng.uniform(10, 2000, 100),
+        'p95_ms': rng.uniform(50, 3000, 100),
+        'toxic_active': rng.choice([0, 1], 100),
+        'label': rng.choice([0, 1], 100, p=[0.9, 0.1])  # Imbalanced
     }
     
     df = pd.DataFrame(data)
@@ -333,17 +400,10 @@ def test_model_with_imbalanced_data(tmp_path):
     assert metrics['recall'] >= 0
 
 
-def test_feature_column_order_matters(tmp_path):
+def test_feature_column_order_matters(tmp_path, fitted_rf):
     """Test that feature order is preserved correctly."""
-    csv_path = create_sample_dataset(tmp_path, n_rows=50)
-    df = train_model.load_data(str(csv_path))
-    
-    feature_cols = ['req_rate', 'err_rate', 'p50_ms', 'p95_ms', 'toxic_active']
-    X, y = train_model.prepare_features(df, feature_cols)
-    
-    # Train model
-    model = RandomForestClassifier(n_estimators=10, random_state=42)
-    model.fit(X, y)
+    feature_cols = FEATURE_COLS
+    model, X, y = fitted_rf
     
     # Save columns
     cols_path = tmp_path / "cols_order.json"
@@ -377,13 +437,13 @@ def test_feature_column_order_matters(tmp_path):
 
 def test_risk_score_range():
     """Test that risk scores are always between 0 and 1."""
-    np.random.seed(42)
+    rng = np.random.default_rng(42)
     
     # Create synthetic probabilities from a model
     n_samples = 100
     mock_probabilities = np.column_stack([
-        np.random.uniform(0, 1, n_samples),
-        np.random.uniform(0, 1, n_samples)
+        rng.uniform(0, 1, n_samples),
+        rng.uniform(0, 1, n_samples)
     ])
     
     # Normalize to sum to 1 (like real predict_proba output)
@@ -399,18 +459,18 @@ def test_risk_score_range():
 
 def test_dataset_with_nan_rows(tmp_path):
     """Test that NaN rows are properly dropped."""
-    np.random.seed(42)
+    rng = np.random.default_rng(42)
     
     # Create dataset with some NaN values
     data = {
         'timestamp': pd.date_range('2025-01-01', periods=50, freq='1min'),
         'service': ['service-a'] * 50,
-        'req_rate': np.random.uniform(0.1, 1.0, 50),
-        'err_rate': np.random.uniform(0.0, 0.5, 50),
-        'p50_ms': np.random.uniform(10, 2000, 50),
-        'p95_ms': np.random.uniform(50, 3000, 50),
-        'toxic_active': np.random.choice([0, 1], 50),
-        'label': np.random.choice([0, 1], 50)
+        'req_rate': rng.uniform(0.1, 1.0, 50),
+        'err_rate': rng.uniform(0.0, 0.5, 50),
+        'p50_ms': rng.uniform(10, 2000, 50),
+        'p95_ms': rng.uniform(50, 3000, 50),
+        'toxic_active': rng.choice([0, 1], 50),
+        'label': rng.choice([0, 1], 50)
     }
     
     df = pd.DataFrame(data)
@@ -430,5 +490,73 @@ def test_dataset_with_nan_rows(tmp_path):
     assert df_loaded.isna().sum().sum() == 0
 
 
+def test_onnx_export_matches_sklearn(tmp_path, fitted_rf):
+    """ONNX export scored via onnxruntime agrees with the sklearn model."""
+    pytest.importorskip('skl2onnx')
+    pytest.importorskip('onnxruntime')
+
+    feature_cols = FEATURE_COLS
+    model, X, y = fitted_rf
+
+    onnx_path = tmp_path / "model.onnx"
+    assert train_model.export_onnx(model, len(feature_cols), onnx_path)
+    cols_path = tmp_path / "cols.json"
+    cols_path.write_text(json.dumps(feature_cols))
+
+    onnx_model, loaded_cols = predict_failure.load_model_and_features(str(onnx_path), str(cols_path))
+
+    row_json = '{"req_rate":0.5,"err_rate":0.1,"p50_ms":100,"p95_ms":500,"toxic_active":0}'
+    features = predict_failure.parse_row_input(row_json, loaded_cols)
+    risk_score, label_hat = predict_failure.predict(onnx_model, features)
+
+    assert risk_score == pytest.approx(model.predict_proba(features)[0, 1], abs=1e-5)
+    assert label_hat == int(model.predict(features)[0])
+
+
+def test_serve_mode_scores_ndjson_rows(fitted_rf):
+    """--serve scores each stdin line, reports bad lines and caches repeated rows."""
+    import io
+
+    feature_cols = FEATURE_COLS
+    model, X, y = fitted_rf
+
+    predictor = predict_failure.Predictor(model, feature_cols)
+    row = '{"req_rate":0.5,"err_rate":0.1,"p50_ms":100,"p95_ms":500,"toxic_active":0}'
+    stdin = io.StringIO("\n".join([row, row, "not json", '{"req_rate":0.5}']) + "\n")
+    stdout = io.StringIO()
+
+    predict_failure.serve(predictor, stdin, stdout)
+
+    results = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert len(results) == 4
+    expected = predict_failure.predict(model, predict_failure.parse_row_input(row, feature_cols))
+    assert results[0] == results[1]
+    assert results[0]["risk_score"] == pytest.approx(expected[0])
+    assert results[0]["label_hat"] == expected[1]
+    assert "error" in results[2] and "error" in results[3]
+    assert predictor._score.cache_info().hits == 1
+
+
+def test_predict_batch_matches_single_row(fitted_rf):
+    """--rows batch scoring gives the same result as scoring each row alone."""
+    feature_cols = FEATURE_COLS
+    model, X, y = fitted_rf
+
+    rows = [dict(zip(feature_cols, x)) for x in X[:8].tolist()]
+    features = predict_failure.parse_rows_input(json.dumps(rows), feature_cols)
+    assert features.shape == (8, 5)
+
+    risk_scores, labels = predict_failure.predict_batch(model, features)
+    # predict() hands multi-row input to the batch path
+    multi_scores, multi_labels = predict_failure.predict(model, features)
+    assert np.array_equal(multi_scores, risk_scores) and np.array_equal(multi_labels, labels)
+    for i, row in enumerate(rows):
+        single = predict_failure.parse_row_input(json.dumps(row), feature_cols)
+        risk_score, label_hat = predict_failure.predict(model, single)
+        assert type(risk_score) is float and type(label_hat) is int
+        assert risk_scores[i] == pytest.approx(risk_score)
+        assert labels[i] == label_hat
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
\ No newline at end of file
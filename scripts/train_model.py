@@ -1,30 +1,84 @@
 #!/usr/bin/env python3
 """
 Train a failure prediction model from metrics dataset.
-Tries LogisticRegression and RandomForestClassifier, picks best by ROC AUC.
+Tries LogisticRegression, a tree ensemble (RandomForestClassifier, or
+ExtraTreesClassifier with --model et) and HistGradientBoostingClassifier,
+picks best by ROC AUC.
 """
 
 import argparse
 import json
+import os
 import sys
 from pathlib import Path
 
 import pandas as pd
 import numpy as np
+
+# Optional Intel oneDAL acceleration: SKLEARNEX=1 patches sklearn before its
+# estimators are imported. Opt-in because the saved model is then an sklearnex
+# class, and whatever loads it needs scikit-learn-intelex installed too.
+if os.environ.get('SKLEARNEX') == '1':
+    try:
+        from sklearnex import patch_sklearn
+        patch_sklearn()
+    except ImportError:
+        print("⚠️  SKLEARNEX=1 but scikit-learn-intelex is not installed, using stock sklearn", file=sys.stderr)
+
 from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import ExtraTreesClassifier, HistGradientBoostingClassifier, RandomForestClassifier
 from sklearn.metrics import precision_score, recall_score, f1_score, roc_auc_score
+from sklearn.utils.class_weight import compute_class_weight
 import joblib
+from joblib import Parallel, delayed
+from threadpoolctl import threadpool_limits
+
+# pyarrow parses the CSV multithreaded, column by column; optional, the C
+# parser is used when it is not installed
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
+
+
+# Columns used for training, read with the narrowest dtype that holds them.
+# Int8 is pandas' nullable integer so rows with gaps still load (and are
+# dropped below); timestamp/service are never parsed.
+COLUMN_DTYPES = {
+    'req_rate': np.float32,
+    'err_rate': np.float32,
+    'p50_ms': np.float32,
+    'p95_ms': np.float32,
+    'toxic_active': 'Int8',
+    'label': 'Int8',
+}
 
 
 def load_data(csv_path):
     """Load dataset and drop rows with NaN values."""
-    df = pd.read_csv(csv_path)
+    df = pd.read_csv(csv_path, usecols=list(COLUMN_DTYPES), dtype=COLUMN_DTYPES, engine=CSV_ENGINE)
     print(f"Loaded {len(df)} rows from {csv_path}")
-    
-    # Drop rows with NaN
-    df_clean = df.dropna()
+    return drop_nan_rows(df)
+
+
+def load_dataframe(df):
+    """Same as load_data, for a dataset already in memory (no CSV round trip).
+    The input frame is left untouched."""
+    df = df[list(COLUMN_DTYPES)].astype(COLUMN_DTYPES)
+    print(f"Loaded {len(df)} rows")
+    return drop_nan_rows(df)
+
+
+def drop_nan_rows(df):
+    """Drop rows with NaN values; raises ValueError if none are left."""
+    # One mask over the (all numeric) columns, and no row copy at all when
+    # nothing is missing
+    valid = np.ones(len(df), dtype=bool)
+    for col in df.columns:
+        valid &= df[col].notna().to_numpy()
+    df_clean = df if valid.all() else df[valid]
     print(f"After dropping NaN: {len(df_clean)} rows")
     
     if len(df_clean) == 0:
@@ -34,54 +88,125 @@ def load_data(csv_path):
 
 
 def prepare_features(df, feature_cols):
-    """Extract features and labels."""
-    X = df[feature_cols].values
-    y = df['label'].values
+    """Extract features (as float32, the dtype predict_failure scores with) and labels."""
+    # pandas keeps a block per column (and toxic_active/label are nullable
+    # Int8), so X is always a fresh array. Fill it column by column straight
+    # into C order: one copy, row-major like the rows predict_failure scores
+    X = np.empty((len(df), len(feature_cols)), dtype=np.float32)
+    for j, col in enumerate(feature_cols):
+        X[:, j] = df[col].to_numpy(dtype=np.float32)
+    y = df['label'].to_numpy(dtype=np.int8)
     
     print(f"\nFeature matrix shape: {X.shape}")
     print(f"Label distribution:")
-    unique, counts = np.unique(y, return_counts=True)
-    for label, count in zip(unique, counts):
-        print(f"  Label {label}: {count} ({count/len(y)*100:.1f}%)")
+    # labels are 0/1, so bincount counts both classes in one pass (no sort)
+    for label, count in enumerate(np.bincount(y, minlength=2)):
+        if count:
+            print(f"  Label {label}: {count} ({count/len(y)*100:.1f}%)")
     
     return X, y
 
 
-def train_and_evaluate(X_train, X_test, y_train, y_test, model, model_name):
-    """Train a model and return evaluation metrics."""
-    print(f"\n{'='*50}")
-    print(f"Training: {model_name}")
-    print(f"{'='*50}")
-    
-    # Train
+def build_tree_model(kind, random_seed):
+    """Build the tree ensemble for --model: 'rf' (RandomForest) or 'et' (ExtraTrees).
+    ExtraTrees draws split thresholds at random instead of searching them, so it
+    fits faster for comparable accuracy.
+
+    Both fit and score their trees on every core (n_jobs=-1). sklearn runs forest
+    trees on threads, since the Cython tree builder releases the GIL, so there is
+    no process backend to configure and X is not copied per worker."""
+    if kind == 'et':
+        return (ExtraTreesClassifier(n_estimators=200, max_depth=8, min_samples_leaf=2, max_features='sqrt',
+                                     n_jobs=-1, random_state=random_seed, class_weight='balanced'),
+                "ExtraTreesClassifier")
+    return (RandomForestClassifier(n_estimators=200, max_depth=8, max_features='sqrt',
+                                   n_jobs=-1, random_state=random_seed, class_weight='balanced'),
+            "RandomForestClassifier")
+
+
+def resume_tree_model(model_path, add_trees, y=None):
+    """Load a previously saved forest and set it up to grow `add_trees` more trees.
+    With warm_start the next fit() only builds the new trees. Returns None when the
+    saved model is not a tree ensemble (e.g. LogisticRegression won last time).
+
+    sklearn warns about class_weight='balanced' under warm_start, so when the
+    labels `y` are given it is replaced by the explicit weights it stands for."""
+    model = joblib.load(model_path)
+    if not hasattr(model, 'estimators_') or 'warm_start' not in model.get_params():
+        return None
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + add_trees, n_jobs=-1)
+    if y is not None and model.class_weight == 'balanced':
+        classes = np.unique(y)
+        weights = compute_class_weight('balanced', classes=classes, y=y)
+        model.class_weight = dict(zip(classes.tolist(), weights.tolist()))
+    return model, f"{type(model).__name__} (resumed)"
+
+
+def fit_and_score(X_train, X_test, y_train, y_test, model):
+    """Fit a model and return it with its test-set metrics (prints nothing)."""
     model.fit(X_train, y_train)
     
-    # Predict
-    y_pred = model.predict(X_test)
+    # Predict once: for a binary classifier predict() is predict_proba() > 0.5
+    # (ties go to class 0), so derive the labels instead of re-running inference
     y_proba = model.predict_proba(X_test)[:, 1]
+    y_pred = (y_proba > 0.5).astype(np.int8)
     
     # Calculate metrics
-    precision = precision_score(y_test, y_pred, zero_division=0)
-    recall = recall_score(y_test, y_pred, zero_division=0)
-    f1 = f1_score(y_test, y_pred, zero_division=0)
-    roc_auc = roc_auc_score(y_test, y_proba)
-    
     metrics = {
-        'precision': precision,
-        'recall': recall,
-        'f1': f1,
-        'roc_auc': roc_auc
+        'precision': precision_score(y_test, y_pred, zero_division=0),
+        'recall': recall_score(y_test, y_pred, zero_division=0),
+        'f1': f1_score(y_test, y_pred, zero_division=0),
+        'roc_auc': roc_auc_score(y_test, y_proba)
     }
-    
-    # Print results
-    print(f"Precision: {precision:.4f}")
-    print(f"Recall:    {recall:.4f}")
-    print(f"F1 Score:  {f1:.4f}")
-    print(f"ROC AUC:   {roc_auc:.4f}")
-    
     return model, metrics
 
 
+def print_metrics(metrics):
+    """Print the metrics returned by fit_and_score."""
+    print(f"Precision: {metrics['precision']:.4f}")
+    print(f"Recall:    {metrics['recall']:.4f}")
+    print(f"F1 Score:  {metrics['f1']:.4f}")
+    print(f"ROC AUC:   {metrics['roc_auc']:.4f}")
+
+
+def print_model_header(model_name):
+    print(f"\n{'='*50}")
+    print(f"Training: {model_name}")
+    print(f"{'='*50}")
+
+
+def train_and_evaluate(X_train, X_test, y_train, y_test, model, model_name):
+    """Train a model and return evaluation metrics."""
+    print_model_header(model_name)
+    model, metrics = fit_and_score(X_train, X_test, y_train, y_test, model)
+    print_metrics(metrics)
+    return model, metrics
+
+
+def onnx_bytes(model, n_features):
+    """Serialize the model to ONNX, or return None when skl2onnx is not installed.
+    Raises if the installed skl2onnx cannot convert this model (it has no working
+    HistGradientBoosting converter, for instance)."""
+    try:
+        from convert_model import convert
+    except ImportError:
+        return None
+    return convert(model, n_features).SerializeToString()
+
+
+def export_onnx(model, n_features, onnx_out):
+    """Write an ONNX copy of the model for predict_failure.py's onnxruntime path.
+    Its tree ensemble keeps thresholds and leaf values as float32 (sklearn's Tree
+    holds them as read-only float64). Returns False (and leaves no file) when
+    skl2onnx is not installed."""
+    onx = onnx_bytes(model, n_features)
+    if onx is None:
+        return False
+    with open(onnx_out, 'wb') as f:
+        f.write(onx)
+    return True
+
+
 def main():
     parser = argparse.ArgumentParser(description='Train failure prediction model')
     parser.add_argument('--data', required=True, help='Path to CSV dataset')
@@ -89,6 +214,11 @@ def main():
     parser.add_argument('--cols-out', required=True, help='Path to save feature columns JSON')
     parser.add_argument('--test-size', type=float, default=0.2, help='Test split ratio (default: 0.2)')
     parser.add_argument('--random-seed', type=int, default=42, help='Random seed for reproducibility')
+    parser.add_argument('--model', choices=['rf', 'et'], default='rf',
+                        help='Tree ensemble to compare against LogisticRegression: rf=RandomForest, et=ExtraTrees (default: rf)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Grow the forest saved at --model-out by --add-trees trees instead of fitting a new one')
+    parser.add_argument('--add-trees', type=int, default=50, help='Trees added with --resume (default: 50)')
     
     args = parser.parse_args()
     
@@ -117,8 +247,11 @@ def main():
     print("\n" + "="*60)
     print("STEP 2: Splitting Data")
     print("="*60)
+    # Stratify only when both classes are present (nothing to balance otherwise)
+    failure_count = int(np.bincount(y, minlength=2)[1])
+    stratify_arg = y if 0 < failure_count < len(y) else None
     X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=args.test_size, random_state=args.random_seed, shuffle=True, stratify=y
+        X, y, test_size=args.test_size, random_state=args.random_seed, shuffle=True, stratify=stratify_arg
     )
     print(f"Train set: {len(X_train)} rows")
     print(f"Test set:  {len(X_test)} rows")
@@ -128,16 +261,45 @@ def main():
     print("STEP 3: Training Models")
     print("="*60)
     
+    tree_model = None
+    if args.resume:
+        if Path(args.model_out).exists():
+            tree_model = resume_tree_model(args.model_out, args.add_trees, y_train)
+        if tree_model is None:
+            print(f"⚠️  No saved forest at {args.model_out} to resume, fitting a new one")
+    
     models = [
         (LogisticRegression(solver='liblinear', class_weight='balanced', random_state=args.random_seed, max_iter=1000),
          "LogisticRegression"),
-        (RandomForestClassifier(n_estimators=200, max_depth=8, random_state=args.random_seed, class_weight='balanced'),
-         "RandomForestClassifier")
+        tree_model or build_tree_model(args.model, args.random_seed),
+        # Histogram-binned boosting: fits much faster than the forest on tabular data
+        (HistGradientBoostingClassifier(max_iter=200, max_depth=8, learning_rate=0.1, early_stopping=True,
+                                        class_weight='balanced', random_state=args.random_seed),
+         "HistGradientBoostingClassifier")
     ]
     
+    # The candidates are independent, so they fit side by side. Threads rather
+    # than processes: liblinear and the tree builder both release the GIL, and
+    # the training arrays are shared instead of pickled to workers. Output is
+    # printed afterwards, in order. The forest (joblib threads) and
+    # HistGradientBoosting (OpenMP threads) each get half the cores so the
+    # concurrent fits do not oversubscribe the machine.
+    half_cores = max(1, (os.cpu_count() or 1) // 2)
+    forest, _ = models[1]
+    forest.set_params(n_jobs=half_cores)
+
+    def fit_limited(model):
+        # OpenMP limits are per calling thread, so this caps only this fit
+        with threadpool_limits(limits=half_cores, user_api='openmp'):
+            return fit_and_score(X_train, X_test, y_train, y_test, model)
+
+    fitted = Parallel(n_jobs=len(models), prefer='threads')(
+        delayed(fit_limited)(model) for model, _ in models
+    )
     results = []
-    for model, name in models:
-        trained_model, metrics = train_and_evaluate(X_train, X_test, y_train, y_test, model, name)
+    for (_, name), (trained_model, metrics) in zip(models, fitted):
+        print_model_header(name)
+        print_metrics(metrics)
         results.append((trained_model, name, metrics))
     
     # Select best model by ROC AUC
@@ -158,10 +320,33 @@ def main():
     Path(args.model_out).parent.mkdir(parents=True, exist_ok=True)
     Path(args.cols_out).parent.mkdir(parents=True, exist_ok=True)
     
-    # Save model
-    joblib.dump(best_model, args.model_out)
+    # Persist single-threaded: predict() calls score one or a few rows, where
+    # joblib worker setup costs more than the trees (predict_batch opts in to
+    # n_jobs=-1 for large batches)
+    if hasattr(best_model, 'n_jobs'):
+        best_model.n_jobs = 1
+    
+    # Save model, zlib-compressed: tree node arrays shrink ~3x and joblib.load
+    # decompresses transparently (mmap_mode would not help, sklearn copies the
+    # nodes into its own buffers on unpickling)
+    joblib.dump(best_model, args.model_out, compress=3)
     print(f"✅ Model saved to: {args.model_out}")
     
+    # ONNX copy next to the pickle (failure_predictor.pkl -> failure_predictor.onnx),
+    # written only when the winner converts (skl2onnx has no working
+    # HistGradientBoosting converter). Otherwise an export from an earlier run
+    # is removed so nothing serves a different model than the pickle.
+    onnx_out = Path(args.model_out).with_suffix('.onnx')
+    try:
+        if export_onnx(best_model, len(feature_cols), onnx_out):
+            print(f"✅ ONNX model saved to: {onnx_out}")
+        else:
+            print("⚠️  skl2onnx not installed, skipping ONNX export")
+    except Exception as e:
+        onnx_out.unlink(missing_ok=True)
+        print(f"⚠️  {best_name} cannot be exported to ONNX, only the .pkl was saved: "
+              f"{str(e).splitlines()[0][:200]}")
+    
     # Save feature columns
     with open(args.cols_out, 'w') as f:
         json.dump(feature_cols, f, indent=2)
@@ -1,9 +1,15 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Dict
+
+import httpx
+import numpy as np
+from fastapi import FastAPI, HTTPException
 from prometheus_client import Gauge, CONTENT_TYPE_LATEST, generate_latest
 from prometheus_client import CollectorRegistry
-from fastapi.responses import Response, JSONResponse
-import os, json, time
-import requests
+from fastapi.responses import Response, ORJSONResponse
+import os, json, time, threading
+from cachetools import TTLCache
 
 # --- Model loading is optional now; we stub if not present ---
 MODEL_PATH = os.getenv("MODEL_PATH", "models/failure_predictor.pkl")
@@ -13,10 +19,40 @@ PROM_URL = os.getenv("PROM_URL", "http://prometheus:9090")
 model = None
 feature_cols = ["req_rate","err_rate","p50_ms","p95_ms","toxic_active"]
 
+class _OnnxModel:
+    """onnxruntime session exposing the same predict_proba() as the sklearn model."""
+
+    def __init__(self, path):
+        import onnxruntime as ort
+        self.session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict_proba(self, X):
+        # outputs are (label, probabilities); train_model exports without zipmap
+        _, proba = self.session.run(None, {self.input_name: np.asarray(X, dtype=np.float32)})
+        return proba
+
+def _load_model(path):
+    """Load the model at `path`, scoring through onnxruntime when possible.
+    train_model.py writes an .onnx copy right after the .pkl, so a sibling .onnx
+    at least as new as the pickle is the same model without sklearn's per-call
+    input validation. The pickle is not loaded with mmap_mode: it is saved
+    compressed, and sklearn copies tree arrays into its own buffers on load, so
+    mapped pages would not be shared between workers anyway."""
+    onnx_path = os.path.splitext(path)[0] + ".onnx"
+    if path.endswith(".onnx"):
+        return _OnnxModel(path)
+    if os.path.exists(onnx_path) and os.path.getmtime(onnx_path) >= os.path.getmtime(path):
+        try:
+            return _OnnxModel(onnx_path)
+        except Exception:
+            pass  # onnxruntime missing or unreadable export: use the pickle
+    import joblib
+    return joblib.load(path)
+
 try:
-    import joblib, json
     if os.path.exists(MODEL_PATH):
-        model = joblib.load(MODEL_PATH)
+        model = _load_model(MODEL_PATH)
     if os.path.exists(COLS_PATH):
         with open(COLS_PATH) as f:
             feature_cols = json.load(f)
@@ -24,22 +60,61 @@ except Exception as e:
     # model stays None; we'll return a dummy score
     pass
 
+# GET /predict's feature row, filled in place on every call. Inference runs on
+# worker threads, so each thread gets its own buffer.
+_local = threading.local()
+
+def _infer(feats):
+    """Model risk for one feature dict; runs off the event loop (see _predict_live)."""
+    x = getattr(_local, "x", None)
+    if x is None:
+        x = _local.x = np.zeros((1, len(feature_cols)), dtype=np.float32)
+    for i, c in enumerate(feature_cols):
+        x[0, i] = feats.get(c, 0.0)
+    return float(model.predict_proba(x)[0, 1])
+
 # Prometheus registry and metric
 registry = CollectorRegistry()
 risk_gauge = Gauge("failure_risk_score", "Predicted failure risk [0..1]",
                    ["service"], registry=registry)
 
-app = FastAPI()
+# Last GET /predict result per service. Dashboards and scrapers poll the same
+# service many times a second; within the TTL they get the cached answer
+# instead of four fresh Prometheus queries.
+PREDICT_CACHE_TTL = float(os.getenv("PREDICT_CACHE_TTL", "5"))
+_predict_cache = TTLCache(maxsize=64, ttl=PREDICT_CACHE_TTL)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled client for the Prometheus queries, shared by all requests.
+    # Keep-alive sockets are reused across queries; against an https PROM_URL
+    # HTTP/2 multiplexes a request's four queries over a single connection.
+    app.state.prom = httpx.AsyncClient(
+        base_url=PROM_URL,
+        timeout=5.0,
+        http2=True,
+        limits=httpx.Limits(max_connections=16, max_keepalive_connections=16),
+    )
+    # Warm the model up so the first real /predict does not pay the one-off
+    # predict_proba setup cost
+    if model is not None:
+        try:
+            model.predict_proba(np.zeros((1, len(feature_cols)), dtype=np.float32))
+        except Exception:
+            pass
+    yield
+    await app.state.prom.aclose()
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 @app.get("/health")
 def health():
     return {"ok": True, "model_loaded": bool(model), "prom_url": PROM_URL}
 
-def _query_prometheus(query: str):
+async def _query_prometheus(query: str):
     """Query Prometheus instant API."""
     try:
-        url = f"{PROM_URL}/api/v1/query"
-        resp = requests.get(url, params={"query": query}, timeout=5)
+        resp = await app.state.prom.get("/api/v1/query", params={"query": query})
         resp.raise_for_status()
         data = resp.json()
         if data.get("status") == "success":
@@ -52,10 +127,15 @@ def _query_prometheus(query: str):
         # Return 0 on error to keep service running
         return 0.0
 
-def _get_live_features(service: str = "service-a"):
+def _rule_risk(err_rate, p95_ms, toxic_active):
+    """Rule-based risk score; works elementwise on scalars or NumPy columns."""
+    return np.minimum(1.0, (err_rate * 1.5) + np.where(p95_ms > 1000, 0.3, 0.0) + np.where(toxic_active, 0.1, 0.0))
+
+async def _get_live_features(service: str = "service-a"):
     """
     Query live metrics from Prometheus for the specified service.
-    Uses 1-minute rate windows matching training data.
+    Uses 1-minute rate windows matching training data. The queries run
+    concurrently, so this costs one Prometheus round trip rather than four.
     """
     queries = {
         "req_rate": f'sum(rate(request_count_total{{service="{service}"}}[1m]))',
@@ -64,9 +144,8 @@ def _get_live_features(service: str = "service-a"):
         "p95_ms": f'histogram_quantile(0.95, sum(rate(request_latency_seconds_bucket{{service="{service}"}}[1m])) by (le)) * 1000',
     }
     
-    features = {}
-    for name, query in queries.items():
-        features[name] = _query_prometheus(query)
+    values = await asyncio.gather(*(_query_prometheus(q) for q in queries.values()))
+    features = dict(zip(queries, values))
     
     # toxic_active: check if there are any active toxics (stub for now)
     features["toxic_active"] = 1 if features.get("err_rate", 0) > 0.05 else 0
@@ -74,42 +153,86 @@ def _get_live_features(service: str = "service-a"):
     return features
 
 @app.get("/predict")
-def predict(service: str = "service-a"):
-    feats = _get_live_features(service)
-    x = [feats.get(c, 0.0) for c in feature_cols]
+async def predict(service: str = "service-a"):
+    result = _predict_cache.get(service)
+    if result is None:
+        result = await _predict_live(service)
+        # gauge only moves when the risk is actually recomputed
+        risk_gauge.labels(service=service).set(result["risk_score"])
+        _predict_cache[service] = result
+    return ORJSONResponse(result)
+
+async def _predict_live(service: str):
+    """Score `service` from live Prometheus features (uncached)."""
+    feats = await _get_live_features(service)
 
     # Rule-based risk score (more reliable than poorly trained model)
     err_rate = feats.get("err_rate", 0)
     p95 = feats.get("p95_ms", 0)
     toxic = feats.get("toxic_active", 0)
 
-    risk = min(1.0, (err_rate * 1.5) + (0.3 if p95 > 1000 else 0) + (0.1 if toxic else 0))
+    risk = float(_rule_risk(err_rate, p95, toxic))
 
     # Still try model if loaded
     if model is not None:
         try:
-            import numpy as np
-            p = model.predict_proba([x])[0][1]
+            # predict_proba holds the CPU for milliseconds on a forest; keep
+            # /health and /metrics responsive meanwhile
+            p = await asyncio.to_thread(_infer, feats)
             # Only use model if it gives a reasonable score
             if p > 0.1:
-                risk = float(p)
+                risk = p
         except Exception:
             pass
 
     status = "LOW"
     if risk >= 0.7: status = "HIGH_RISK"
     elif risk >= 0.4: status = "MEDIUM"
-    
-    # update gauge
-    risk_gauge.labels(service=service).set(risk)
 
-    return JSONResponse({
+    return {
         "service": service,
         "risk_score": risk,
         "status": status,
         "reason": f"err_rate={feats.get('err_rate', 0):.3f}, p95={feats.get('p95_ms', 0):.0f}ms",
         "features": feats,
         "model_loaded": bool(model)
+    }
+
+@app.post("/predict")
+def predict_rows(payload: Dict[str, Any]):
+    """Score caller-supplied feature rows, {"rows": [{...}, ...]} or one row object,
+    with a single predict_proba call for the whole batch."""
+    rows = payload.get("rows", [payload])
+    if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+        raise HTTPException(status_code=422, detail='"rows" must be a list of feature objects')
+    n = len(rows)
+
+    def column(name):
+        return np.fromiter((float(r.get(name, 0.0)) for r in rows), dtype=np.float64, count=n)
+
+    try:
+        X = np.fromiter((float(r.get(c, 0.0)) for r in rows for c in feature_cols),
+                        dtype=np.float32, count=n * len(feature_cols)).reshape(n, len(feature_cols))
+        risk = _rule_risk(column("err_rate"), column("p95_ms"), column("toxic_active"))
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Feature values must be numeric: {e}")
+
+    # Same blend as GET /predict: model score wins where it is > 0.1
+    if model is not None and n:
+        try:
+            p = model.predict_proba(X)[:, 1]
+            risk = np.where(p > 0.1, p, risk)
+        except Exception:
+            pass
+
+    status = np.where(risk >= 0.7, "HIGH_RISK", np.where(risk >= 0.4, "MEDIUM", "LOW"))
+
+    return ORJSONResponse({
+        "results": [
+            {"risk_score": r, "status": st}
+            for r, st in zip(risk.tolist(), status.tolist())
+        ],
+        "model_loaded": bool(model)
     })
 
 @app.get("/metrics")
@@ -1,4 +1,7 @@
-from fastapi import FastAPI, Response
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import ORJSONResponse
 import httpx, os, asyncio, random
 from json import JSONDecodeError
 
@@ -9,6 +12,11 @@ request_count = Counter('request_count_total', 'Total request count', ['service'
 error_count = Counter('error_count_total', 'Total error count', ['service', 'endpoint'])
 request_latency = Histogram('request_latency_seconds', 'Request latency', ['service', 'endpoint'])
 
+# Label children resolved once; handlers skip the per-call labels() lookup
+charge_requests = request_count.labels(service='service-b', endpoint='/charge')
+charge_errors = error_count.labels(service='service-b', endpoint='/charge')
+charge_latency = request_latency.labels(service='service-b', endpoint='/charge')
+
 from opentelemetry import trace
 from opentelemetry.sdk.resources import Resource
 from opentelemetry.sdk.trace import TracerProvider
@@ -38,7 +46,17 @@ from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
 
 SERVICE_C_URL = os.getenv("SERVICE_C_URL", "http://service-c:8080")
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled client for calls to C, reused across /charge requests
+    app.state.client = httpx.AsyncClient(
+        timeout=5.0,
+        limits=httpx.Limits(max_connections=200, max_keepalive_connections=50),
+    )
+    yield
+    await app.state.client.aclose()
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 FastAPIInstrumentor().instrument_app(app)
 HTTPXClientInstrumentor().instrument()
 
@@ -51,23 +69,21 @@ def health():
     return {"status": "ok", "service": "B"}
 
 @app.get("/charge")
-async def charge():
-    import time
-    start_time = time.time()
-    request_count.labels(service='service-b', endpoint='/charge').inc()
+async def charge(request: Request):
+    start_ns = time.perf_counter_ns()
+    charge_requests.inc()
     
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            r = await client.get(f"{SERVICE_C_URL}/inventory")
+        r = await request.app.state.client.get(f"{SERVICE_C_URL}/inventory")
         try:
             r.raise_for_status()
             body = r.json()
         except JSONDecodeError:
             body = {"non_json_body": r.text}
         except httpx.HTTPStatusError as e:
-            error_count.labels(service='service-b', endpoint='/charge').inc()
+            charge_errors.inc()
             body = {"error": str(e), "status_code": r.status_code, "body": r.text}
         
         return {"service": "B", "downstream": body}
     finally:
-        request_latency.labels(service='service-b', endpoint='/charge').observe(time.time() - start_time)
\ No newline at end of file
+        charge_latency.observe((time.perf_counter_ns() - start_ns) * 1e-9)
\ No newline at end of file